@@ -0,0 +1,64 @@
+"""
+Run the benchmark suite against the local fakes and compare with stored baselines.
+
+    python -m benchmarks                    # run and compare, exit 1 on regression
+    python -m benchmarks --save-baseline    # run and store the results as baseline
+    python -m benchmarks --latency-ms 20 --throttle-every 10
+
+Baselines are machine specific; they are only compared at the default scale and
+when no latency or throttling is injected. Calls that fail, e.g. when throttled,
+are reported per benchmark.
+"""
+import argparse
+import logging
+import sys
+
+from benchmarks import bench_mns, bench_ots, bench_response
+from benchmarks.harness import compare, load_baselines, save_baselines
+
+SUITES = {
+    'ots': bench_ots,
+    'mns': bench_mns,
+    'response': bench_response,
+}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('suites', nargs='*', metavar='suite',
+                        help=f'suites to run, any of {", ".join(SUITES)} (default: all)')
+    parser.add_argument('--latency-ms', type=float, default=0, help='latency added to every fake response')
+    parser.add_argument('--throttle-every', type=int, default=0, help='throttle every n-th fake request')
+    parser.add_argument('--scale', type=float, default=1, help='multiply the number of iterations')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative regression')
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args(argv)
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f'unknown suites: {", ".join(sorted(unknown))}')
+
+    # throttled calls are logged as errors by the clients, keep the report readable
+    logging.getLogger('ks_utils').setLevel(logging.CRITICAL)
+
+    results = []
+    for name in args.suites or SUITES:
+        for result in SUITES[name].run(latency=args.latency_ms / 1000, throttle_every=args.throttle_every,
+                                       scale=args.scale):
+            print(result)
+            results.append(result)
+
+    if args.save_baseline:
+        save_baselines(results)
+        print('baseline saved')
+        return 0
+    if args.latency_ms or args.throttle_every or args.scale != 1:
+        return 0
+
+    regressions = compare(results, load_baselines(), args.tolerance)
+    for message in regressions:
+        print(f'REGRESSION {message}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""
+Compare insert throughput of random (``generate_uuid``) and time ordered
+(``generate_sortable_uuid``) primary keys.
+
+    python -m benchmarks.bench_ids --rows 200000 --batch-size 1000
+"""
+import argparse
+import time
+
+from benchmarks.harness import reset_table, setup_django
+
+
+def insert(model, rows: int, batch_size: int) -> float:
+    reset_table(model)
+    started = time.perf_counter()
+    for start in range(0, rows, batch_size):
+        model.objects.bulk_create(
+            [model(name=f'record {i}') for i in range(start, min(start + batch_size, rows))],
+            batch_size=batch_size,
+        )
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    setup_django()
+    from benchmarks.models import RandomIDRecord, SortableIDRecord
+
+    for model in (RandomIDRecord, SortableIDRecord):
+        elapsed = insert(model, args.rows, args.batch_size)
+        print(f'{model.__name__:<20} {args.rows} rows in {elapsed:.2f}s, {args.rows / elapsed:,.0f} rows/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""``MNSClient`` send/receive/delete against ``FakeMNSServer``."""
+import json
+from typing import List
+
+from benchmarks.fakes import FakeMNSServer
+from benchmarks.harness import Result, measure, override_environ
+
+QUEUE = 'bench-queue'
+BODY = json.dumps({'openid': 'openid-00000001', 'event': 'updated', 'fields': {'name': 'user 1'}})
+
+
+def run(latency: float = 0, throttle_every: int = 0, scale: float = 1) -> List[Result]:
+    from ks_utils.aliyun.mns.client import MNSClient
+
+    iterations = int(300 * scale)
+    with FakeMNSServer(latency=latency, throttle_every=throttle_every) as server:
+        with override_environ(MNS_ENDPOINT=server.endpoint, MNS_ACCESS_ID='bench-id', MNS_ACCESS_KEY='bench-key'):
+            client = MNSClient()
+
+        def receive_delete():
+            msg = client.receive_message(queue_name=QUEUE)
+            if msg is None:
+                return False
+            client.delete_message(queue_name=QUEUE, receipt_handle=msg.receipt_handle)
+            # delete_message returns nothing, a failed delete leaves the message in flight
+            return msg.receipt_handle not in server.inflight
+
+        # the client logs MNS errors and returns None instead of raising
+        results = [
+            measure('mns.send_message', lambda: client.send_message(queue_name=QUEUE, msg_body=BODY),
+                    iterations=iterations, ok=bool),
+            measure('mns.batch_send_message[16]',
+                    lambda: client.batch_send_message(queue_name=QUEUE, msg_bodies=[BODY] * 16),
+                    iterations=iterations // 16 or 1, ok=bool),
+            # the sends above left enough messages for every receive below, unless some failed
+            measure('mns.receive_delete', receive_delete, iterations=iterations, ok=bool),
+        ]
+        return results
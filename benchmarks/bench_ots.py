@@ -0,0 +1,39 @@
+"""``Client.search`` and ``Client.get_results`` against ``FakeOTSServer``."""
+from typing import List
+
+from benchmarks.fakes import FakeOTSServer, make_ots_rows
+from benchmarks.harness import Result, measure, override_environ
+
+ACCESS_ID = 'bench-id'
+ACCESS_KEY = 'bench-key'
+
+QUERY = {
+    'must': [
+        {'kind': 'term', 'condition': ('city', 'shanghai')},
+        {'kind': 'range', 'condition': ('score', 0, 1000000, True, False)},
+    ],
+    'must_not': [
+        {'kind': 'exist', 'condition': ('deleted_at',)},
+    ],
+    'sort': [
+        {'kind': 'field', 'condition': ('score', 'desc')},
+    ],
+}
+
+
+def run(latency: float = 0, throttle_every: int = 0, scale: float = 1) -> List[Result]:
+    from ks_utils.aliyun.ots.client import Client
+
+    with FakeOTSServer(make_ots_rows(1000), ACCESS_ID, ACCESS_KEY,
+                       latency=latency, throttle_every=throttle_every) as server:
+        with override_environ(OTS_ENDPOINT=server.endpoint, OTS_ACCESS_ID=ACCESS_ID, OTS_ACCESS_KEY=ACCESS_KEY):
+            client = Client(instance_name='bench')
+
+        def search():
+            client.search('users', 'users_index', QUERY, limit=100, get_total_count=True)
+
+        results = [measure('ots.search[100]', search, iterations=int(200 * scale))]
+        search()
+        results.append(measure('ots.get_results[100]', lambda: client.get_results(with_id=True),
+                               iterations=int(2000 * scale)))
+        return results
@@ -0,0 +1,41 @@
+"""``excel_download`` and ``KSPagination`` on a SQLite fixture."""
+from typing import List
+
+from benchmarks.harness import Result, measure, reset_table, setup_django
+
+ROWS = 5000
+FIELDS = ('id', 'name', 'created')
+COLUMNS = ['ID', 'Name', 'Created']
+
+
+def run(latency: float = 0, throttle_every: int = 0, scale: float = 1) -> List[Result]:
+    setup_django()
+    from benchmarks.models import SortableIDRecord
+    from ks_utils.ninja.pagination import KSPagination
+    from ks_utils.ninja.response import excel_download
+
+    reset_table(SortableIDRecord)
+    SortableIDRecord.objects.bulk_create(
+        [SortableIDRecord(name=f'record {i}') for i in range(ROWS)],
+        batch_size=1000,
+    )
+    qs = SortableIDRecord.objects.order_by('id')
+
+    def export_list():
+        excel_download(list(qs.values(*FIELDS)), FIELDS, COLUMNS)
+
+    paginator = KSPagination()
+
+    def paginate(page):
+        pagination = KSPagination.Input(page=page, per_page=100)
+        result = paginator.paginate_queryset(qs, pagination)
+        return list(result['items']), result['total']
+
+    iterations = max(int(10 * scale), 2)
+    return [
+        measure(f'excel_download.queryset[{ROWS}]', lambda: excel_download(qs, FIELDS, COLUMNS),
+                iterations=iterations),
+        measure(f'excel_download.list[{ROWS}]', export_list, iterations=iterations),
+        measure('ks_pagination.first_page', lambda: paginate(1), iterations=int(200 * scale)),
+        measure('ks_pagination.last_page', lambda: paginate(ROWS // 100), iterations=int(200 * scale)),
+    ]
@@ -0,0 +1,278 @@
+"""
+Local stand-ins for the Tablestore search API and the MNS queue/topic API.
+
+Both servers speak enough of the real wire protocol for ``tablestore.OTSClient`` and
+``mns.account.Account`` to talk to them unmodified. Every response can be delayed by
+``latency`` seconds, and every ``throttle_every``-th request is rejected the way the
+real service rejects throttled requests.
+"""
+import base64
+import hashlib
+import hmac
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+MNS_XMLNS = 'http://mns.aliyuncs.com/doc/v1/'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # write each response in one go, otherwise delayed ACKs add ~40ms per request
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def _dispatch(self):
+        server: FakeServer = self.server.fake
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if server.latency:
+            time.sleep(server.latency)
+        if server.should_throttle():
+            status, headers, data = server.throttled(self)
+        else:
+            status, headers, data = server.handle(self, body)
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.wfile.flush()
+
+    do_GET = do_POST = do_PUT = do_DELETE = _dispatch
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeServer:
+    """Threaded HTTP server on a free local port, usable as a context manager."""
+
+    def __init__(self, latency: float = 0, throttle_every: int = 0):
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def should_throttle(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            return bool(self.throttle_every) and self.requests % self.throttle_every == 0
+
+    def handle(self, request: BaseHTTPRequestHandler, body: bytes):
+        raise NotImplementedError
+
+    def throttled(self, request: BaseHTTPRequestHandler):
+        raise NotImplementedError
+
+
+class FakeMNSServer(FakeServer):
+    """
+    In memory MNS queues and topics: send, batch send, receive, delete and publish.
+    Received messages stay invisible until deleted.
+    """
+
+    def __init__(self, latency: float = 0, throttle_every: int = 0):
+        super().__init__(latency=latency, throttle_every=throttle_every)
+        self.queues = {}
+        self.inflight = {}
+        self.published = {}
+
+    def handle(self, request, body):
+        url = urlparse(request.path)
+        parts = url.path.strip('/').split('/')
+        query = parse_qs(url.query)
+        if len(parts) != 3 or parts[2] != 'messages':
+            return self._error(404, 'NotImplemented', url.path)
+
+        kind, name = parts[0], parts[1]
+        if kind == 'topics' and request.command == 'POST':
+            return self._publish(name, body)
+        if kind != 'queues':
+            return self._error(404, 'NotImplemented', url.path)
+        if request.command == 'POST':
+            return self._send(name, body)
+        if request.command == 'GET':
+            return self._receive(name)
+        if request.command == 'DELETE':
+            return self._delete(name, query.get('ReceiptHandle', [''])[0])
+        return self._error(405, 'MethodNotAllowed', request.command)
+
+    def throttled(self, request):
+        return self._error(503, 'QpsLimitExceeded', 'throttled by fake server')
+
+    def _send(self, name, body):
+        root = ElementTree.fromstring(body)
+        tag = f'{{{MNS_XMLNS}}}'
+        messages = [root] if root.tag == f'{tag}Message' else list(root)
+        items = []
+        with self._lock:
+            queue = self.queues.setdefault(name, deque())
+            for message in messages:
+                msg_body = message.findtext(f'{tag}MessageBody', '')
+                msg_id = uuid.uuid4().hex.upper()
+                md5 = hashlib.md5(msg_body.encode()).hexdigest().upper()
+                queue.append((msg_id, md5, msg_body, int(time.time() * 1000)))
+                items.append(f'<MessageId>{msg_id}</MessageId><MessageBodyMD5>{md5}</MessageBodyMD5>')
+        if root.tag == f'{tag}Message':
+            return self._xml(201, f'<Message xmlns="{MNS_XMLNS}">{items[0]}</Message>')
+        items = ''.join(f'<Message>{item}</Message>' for item in items)
+        return self._xml(201, f'<Messages xmlns="{MNS_XMLNS}">{items}</Messages>')
+
+    def _receive(self, name):
+        with self._lock:
+            queue = self.queues.get(name)
+            if not queue:
+                return self._error(404, 'MessageNotExist', 'Message not exist.')
+            msg_id, md5, msg_body, enqueued = queue.popleft()
+            handle = uuid.uuid4().hex
+            self.inflight[handle] = (name, msg_id)
+        now = int(time.time() * 1000)
+        return self._xml(200, (
+            f'<Message xmlns="{MNS_XMLNS}">'
+            f'<MessageId>{msg_id}</MessageId><ReceiptHandle>{handle}</ReceiptHandle>'
+            f'<MessageBodyMD5>{md5}</MessageBodyMD5><MessageBody>{escape(msg_body)}</MessageBody>'
+            f'<EnqueueTime>{enqueued}</EnqueueTime><NextVisibleTime>{now + 30000}</NextVisibleTime>'
+            f'<FirstDequeueTime>{now}</FirstDequeueTime><DequeueCount>1</DequeueCount>'
+            f'<Priority>8</Priority></Message>'
+        ))
+
+    def _delete(self, name, handle):
+        with self._lock:
+            if self.inflight.pop(handle, None) is None:
+                return self._error(404, 'ReceiptHandleError', 'Receipt handle not exist.')
+        return 204, {'x-mns-request-id': uuid.uuid4().hex}, b''
+
+    def _publish(self, name, body):
+        root = ElementTree.fromstring(body)
+        msg_body = root.findtext(f'{{{MNS_XMLNS}}}MessageBody', '')
+        msg_id = uuid.uuid4().hex.upper()
+        md5 = hashlib.md5(msg_body.encode()).hexdigest().upper()
+        with self._lock:
+            self.published.setdefault(name, []).append(msg_body)
+        return self._xml(201, (
+            f'<Message xmlns="{MNS_XMLNS}"><MessageId>{msg_id}</MessageId>'
+            f'<MessageBodyMD5>{md5}</MessageBodyMD5></Message>'
+        ))
+
+    def _xml(self, status, data):
+        headers = {'Content-Type': 'text/xml;charset=utf-8', 'x-mns-request-id': uuid.uuid4().hex}
+        return status, headers, ('<?xml version="1.0" encoding="UTF-8"?>' + data).encode()
+
+    def _error(self, status, code, message):
+        return self._xml(status, (
+            f'<Error xmlns="{MNS_XMLNS}"><Code>{code}</Code><Message>{escape(message)}</Message>'
+            f'<RequestId>{uuid.uuid4().hex}</RequestId><HostId>fake</HostId></Error>'
+        ))
+
+
+class FakeOTSServer(FakeServer):
+    """
+    Tablestore ``Search`` API over ``rows`` (a list of ``(primary_key, attribute_columns)``
+    tuples), honouring limit/offset, total count and next token. Responses are signed
+    with ``access_key`` so the real client accepts them. Throttled requests get the
+    ``OTSServerBusy`` error, which the client retries.
+    """
+
+    def __init__(self, rows: list, access_id: str, access_key: str, latency: float = 0, throttle_every: int = 0):
+        super().__init__(latency=latency, throttle_every=throttle_every)
+        from tablestore.plainbuffer.plain_buffer_builder import PlainBufferBuilder
+
+        self.access_id = access_id
+        self.access_key = access_key
+        self.rows = [bytes(PlainBufferBuilder.serialize_for_put_row(pk, attrs)) for pk, attrs in rows]
+
+    def handle(self, request, body):
+        from tablestore.protobuf import search_pb2
+
+        if urlparse(request.path).path != '/Search':
+            return self._error(request, 400, 'OTSUnsupportOperation', request.path)
+
+        search_request = search_pb2.SearchRequest()
+        search_request.ParseFromString(body)
+        query = search_pb2.SearchQuery()
+        query.ParseFromString(search_request.search_query)
+        offset = int(query.token.decode()) if query.token else query.offset
+        limit = query.limit if query.HasField('limit') else 10
+        end = min(offset + limit, len(self.rows))
+
+        response = search_pb2.SearchResponse()
+        response.total_hits = len(self.rows) if query.get_total_count else -1
+        response.is_all_succeed = True
+        response.rows.extend(self.rows[offset:end])
+        response.next_token = str(end).encode() if end < len(self.rows) else b''
+        return self._response(request, 200, response.SerializeToString())
+
+    def throttled(self, request):
+        return self._error(request, 503, 'OTSServerBusy', 'throttled by fake server')
+
+    def _error(self, request, status, code, message):
+        from tablestore.protobuf import table_store_pb2
+
+        error = table_store_pb2.Error()
+        error.code = code
+        error.message = message
+        return self._response(request, status, error.SerializeToString())
+
+    def _response(self, request, status, data):
+        headers = {
+            'x-ots-contentmd5': base64.b64encode(hashlib.md5(data).digest()).decode(),
+            'x-ots-requestid': uuid.uuid4().hex,
+            'x-ots-date': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'x-ots-contenttype': 'protocol buffer',
+        }
+        signature_string = '\n'.join(sorted(f'{k}:{v}' for k, v in headers.items()))
+        signature_string += '\n' + urlparse(request.path).path
+        signature = base64.b64encode(
+            hmac.new(self.access_key.encode(), signature_string.encode(), hashlib.sha1).digest()
+        ).decode()
+        headers['Authorization'] = f'OTS {self.access_id}:{signature}'
+        headers['Content-Type'] = 'application/x-protobuf'
+        return status, headers, data
+
+
+def make_ots_rows(count: int) -> list:
+    """Rows shaped like a user search index: openid primary key plus a few attributes."""
+    return [
+        ([('openid', f'openid-{i:08d}')], [
+            ('name', f'user {i}'),
+            ('city', 'shanghai'),
+            ('score', i),
+            ('vip', i % 2 == 0),
+        ])
+        for i in range(count)
+    ]
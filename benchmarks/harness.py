@@ -0,0 +1,142 @@
+"""Timing, memory and baseline helpers shared by the benchmarks."""
+import gc
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    django.setup()
+
+
+def reset_table(model):
+    from django.db import connection
+
+    with connection.schema_editor() as editor:
+        if model._meta.db_table in connection.introspection.table_names():
+            editor.delete_model(model)
+        editor.create_model(model)
+
+
+@contextmanager
+def override_environ(**values):
+    saved = {k: os.environ.get(k) for k in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+@dataclass
+class Result:
+    name: str
+    iterations: int
+    ops_per_second: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    peak_kib: float
+    failures: int = 0
+
+    def __str__(self):
+        return (f'{self.name:<32} {self.ops_per_second:>10,.1f} ops/s  p50 {self.p50_ms:>8.2f}ms  '
+                f'p95 {self.p95_ms:>8.2f}ms  p99 {self.p99_ms:>8.2f}ms  peak {self.peak_kib:>9,.0f}KiB  '
+                f'failed {self.failures}')
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[int(pct) - 1]
+
+
+def measure(name: str, func: Callable[[], object], iterations: int, warmup: int = 1,
+            ok: Optional[Callable[[object], bool]] = None) -> Result:
+    """
+    Call ``func`` ``iterations`` times and record per call latency, then call it once
+    more under ``tracemalloc`` for the peak memory, so tracing does not skew timings.
+    Calls whose result fails ``ok`` are counted as failures, e.g. client calls that
+    swallow a throttling error and return ``None``.
+    """
+    for _ in range(warmup):
+        func()
+
+    gc.collect()
+    samples = []
+    failures = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - t)
+        if ok is not None and not ok(result):
+            failures += 1
+    elapsed = time.perf_counter() - started
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    samples_ms = [s * 1000 for s in samples]
+    return Result(
+        name=name,
+        iterations=iterations,
+        ops_per_second=iterations / elapsed,
+        p50_ms=_percentile(samples_ms, 50),
+        p95_ms=_percentile(samples_ms, 95),
+        p99_ms=_percentile(samples_ms, 99),
+        peak_kib=peak / 1024,
+        failures=failures,
+    )
+
+
+def load_baselines(path: str = BASELINES_PATH) -> Dict[str, dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_baselines(results: List[Result], path: str = BASELINES_PATH):
+    baselines = load_baselines(path)
+    for r in results:
+        baselines[r.name] = {k: round(v, 3) if isinstance(v, float) else v for k, v in asdict(r).items()}
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(results: List[Result], baselines: Dict[str, dict], tolerance: float) -> List[str]:
+    """Return a message per metric worse than its baseline by more than ``tolerance``."""
+    regressions = []
+    for r in results:
+        base = baselines.get(r.name)
+        if not base:
+            continue
+        if r.ops_per_second < base['ops_per_second'] * (1 - tolerance):
+            regressions.append(f'{r.name}: {r.ops_per_second:,.1f} ops/s, baseline {base["ops_per_second"]:,.1f}')
+        if r.p95_ms > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{r.name}: p95 {r.p95_ms:.2f}ms, baseline {base["p95_ms"]:.2f}ms')
+        if r.peak_kib > base['peak_kib'] * (1 + tolerance):
+            regressions.append(f'{r.name}: peak {r.peak_kib:,.0f}KiB, baseline {base["peak_kib"]:,.0f}KiB')
+        if r.failures > base.get('failures', 0):
+            regressions.append(f'{r.name}: {r.failures} failed calls, baseline {base.get("failures", 0)}')
+    return regressions
@@ -0,0 +1,13 @@
+from django.db import models
+
+from ks_utils.django.model import BaseModel, SortableBaseModel
+
+
+class RandomIDRecord(BaseModel):
+    name = models.CharField(max_length=255, default='')
+    payload = models.JSONField(default=dict)
+
+
+class SortableIDRecord(SortableBaseModel):
+    name = models.CharField(max_length=255, default='')
+    payload = models.JSONField(default=dict)
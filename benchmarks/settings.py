@@ -0,0 +1,21 @@
+import os
+import tempfile
+
+SECRET_KEY = 'benchmarks'
+INSTALLED_APPS = [
+    'django.contrib.contenttypes',
+    'benchmarks',
+]
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCH_DB', os.path.join(tempfile.gettempdir(), 'ks_utils_bench.sqlite3')),
+    }
+}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+USE_TZ = True
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
@@ -1,11 +1,6 @@
 import logging
 from os import environ
 
-from mns.account import Account
-from mns.mns_exception import MNSExceptionBase
-from mns.queue import Queue, Message
-from mns.topic import Topic, TopicMessage
-
 logger = logging.getLogger(__name__)
 
 
@@ -18,34 +13,52 @@ class MNSClient:
         if not self.endpoint or not self.access_id or not self.access_key:
             raise Exception('missing endpoint, access_id or access_key')
 
+        from mns.account import Account
         self.account = Account(self.endpoint, self.access_id, self.access_key)
 
     def send_message(self, queue_name: str, msg_body: str, delay_seconds: int = -1):
+        from mns.mns_exception import MNSExceptionBase
+        from mns.queue import Message
         try:
-            q: Queue = self.account.get_queue(queue_name=queue_name)
+            q = self.account.get_queue(queue_name=queue_name)
             msg = Message(message_body=msg_body, delay_seconds=delay_seconds)
             return q.send_message(msg)
         except MNSExceptionBase as err:
             logger.error(err)
 
+    def batch_send_message(self, queue_name: str, msg_bodies: list, delay_seconds: int = -1):
+        """Send up to 16 messages in one request, as allowed by MNS."""
+        from mns.mns_exception import MNSExceptionBase
+        from mns.queue import Message
+        try:
+            q = self.account.get_queue(queue_name=queue_name)
+            msgs = [Message(message_body=body, delay_seconds=delay_seconds) for body in msg_bodies]
+            return q.batch_send_message(msgs)
+        except MNSExceptionBase as err:
+            logger.error(err)
+
     def send_topic_message(self, topic_name: str, msg_body: str, msg_tag: str = ''):
+        from mns.mns_exception import MNSExceptionBase
+        from mns.topic import TopicMessage
         try:
-            topic: Topic = self.account.get_topic(topic_name=topic_name)
+            topic = self.account.get_topic(topic_name=topic_name)
             msg = TopicMessage(message_body=msg_body, message_tag=msg_tag)
             return topic.publish_message(msg)
         except MNSExceptionBase as err:
             logger.error(err)
 
     def receive_message(self, queue_name: str, wait_seconds: int = -1):
+        from mns.mns_exception import MNSExceptionBase
         try:
-            q: Queue = self.account.get_queue(queue_name=queue_name)
+            q = self.account.get_queue(queue_name=queue_name)
             return q.receive_message(wait_seconds=wait_seconds)
         except MNSExceptionBase as err:
             logger.error(err)
 
     def delete_message(self, queue_name: str, receipt_handle):
+        from mns.mns_exception import MNSExceptionBase
         try:
-            q: Queue = self.account.get_queue(queue_name=queue_name)
+            q = self.account.get_queue(queue_name=queue_name)
             q.delete_message(receipt_handle=receipt_handle)
         except MNSExceptionBase as err:
             logger.error(err)
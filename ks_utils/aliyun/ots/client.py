@@ -1,10 +1,6 @@
 import logging
 from os import environ
 
-from tablestore import OTSClient, TermQuery, TermsQuery, ColumnReturnType, ColumnsToGet, SearchQuery, \
-    WildcardQuery, PrefixQuery, Sort, FieldSort, SortOrder, BoolQuery, ExistsQuery, \
-    RangeQuery, Count, DistinctCount, Sum, Avg, Max, Min, GroupByFilter, Collapse
-
 logger = logging.getLogger(__name__)
 
 
@@ -179,6 +175,7 @@ class Client:
         if not self.endpoint or not self.access_id or not self.access_key or not instance_name:
             raise Exception('missing endpoint, access_id, access_key or instance_name')
 
+        from tablestore import OTSClient
         self.client = OTSClient(
             self.endpoint,
             self.access_id,
@@ -213,6 +210,7 @@ class Client:
                get_total_count=False,
                columns_to_get=None
                ):
+        from tablestore import ColumnReturnType, ColumnsToGet
         if columns_to_get is None:
             columns_to_get = []
         self.__prepare_query(query)
@@ -294,6 +292,7 @@ class Client:
         return self.total_count
 
     def __get_search_query(self, limit=50, offset=0, next_token=None, get_total_count=False):
+        from tablestore import BoolQuery, SearchQuery
         query = {
             'query': BoolQuery(
                 must_queries=self._must_query,
@@ -321,6 +320,7 @@ class Client:
         return SearchQuery(**query)
 
     def __get_sort_query(self):
+        from tablestore import Sort
         return Sort(
             sorters=self._sort_query
         )
@@ -331,6 +331,8 @@ class Client:
             self.__build_query_terms(k, v)
 
     def __build_query_terms(self, query_type, terms):
+        from tablestore import TermQuery, TermsQuery, WildcardQuery, PrefixQuery, FieldSort, SortOrder, \
+            ExistsQuery, RangeQuery, Count, DistinctCount, Sum, Avg, Max, Min, GroupByFilter, Collapse
         if query_type == 'collapse':
             self._collapse = Collapse(terms)
             return
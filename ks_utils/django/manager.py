@@ -0,0 +1,173 @@
+import copy
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.fields.files import FieldFile
+from model_utils.managers import SoftDeletableManager
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Small thread safe per-process LRU, entries expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 5):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CachedSoftDeletableManager(SoftDeletableManager):
+    """
+    Soft deletable manager with a read-through cache for single row lookups.
+
+    ``get_cached(id=...)`` checks a per-process LRU, then the django cache backend,
+    then the database. The model is responsible for calling ``cache_keys`` before
+    and ``invalidate`` after every write.
+
+    Shared entries are stored with the generation of their key, which ``invalidate``
+    replaces, so a row read before a write but cached after it is never served.
+    Per-process copies may still lag behind a write by up to the local ttl.
+
+    settings:
+        KS_LOOKUP_CACHE_ALIAS: django cache alias, default ``default``
+        KS_LOOKUP_CACHE_TIMEOUT: django cache timeout in seconds, default 300
+        KS_LOOKUP_CACHE_LOCAL_SIZE: per-process LRU size, 0 disables it, default 1024
+        KS_LOOKUP_CACHE_LOCAL_TTL: per-process LRU ttl in seconds, default 5
+    """
+
+    def __init__(self, *args, cache_fields: tuple = ('id',), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_fields = tuple(cache_fields)
+        self._local = None
+
+    @property
+    def local_cache(self) -> LRUCache:
+        if self._local is None:
+            self._local = LRUCache(
+                maxsize=getattr(settings, 'KS_LOOKUP_CACHE_LOCAL_SIZE', 1024),
+                ttl=getattr(settings, 'KS_LOOKUP_CACHE_LOCAL_TTL', 5),
+            )
+        return self._local
+
+    @property
+    def shared_cache(self):
+        return caches[getattr(settings, 'KS_LOOKUP_CACHE_ALIAS', 'default')]
+
+    def cache_key(self, field: str, value) -> str:
+        return f'ks:{self.model._meta.label_lower}:{field}:{value}'
+
+    def generation_key(self, key: str) -> str:
+        return f'{key}:gen'
+
+    def get_cached(self, **kwargs):
+        if len(kwargs) != 1 or next(iter(kwargs)) not in self.cache_fields:
+            raise ValueError(f'get_cached expects exactly one of {self.cache_fields}')
+
+        field, value = next(iter(kwargs.items()))
+        key = self.cache_key(field, value)
+        use_local = self.local_cache.maxsize > 0
+
+        data = self.local_cache.get(key) if use_local else None
+        if data is None:
+            # read the generation before the row, a write committed in between replaces it
+            gen_key = self.generation_key(key)
+            cached = self.shared_cache.get_many([key, gen_key])
+            generation, entry = cached.get(gen_key), cached.get(key)
+            if entry is not None and entry[0] == generation:
+                data = entry[1]
+            else:
+                data = self._dump(self.get(**kwargs))
+                self.shared_cache.set(key, (generation, data), self._timeout)
+            if use_local:
+                self.local_cache.set(key, data)
+        return self._load(data)
+
+    def cache_keys(self, instance) -> set:
+        """
+        Collect every key the instance may be cached under, including the ones of
+        values changed since it was loaded, taken from the model ``tracker`` or from
+        ``LoadedStateMixin``.
+        """
+        tracker = getattr(instance, 'tracker', None)
+        keys = set()
+        for field in self.cache_fields:
+            values = {getattr(instance, field)}
+            if tracker is not None and field in tracker.fields:
+                values.add(tracker.previous(field))
+            if hasattr(instance, 'loaded_value'):
+                values.add(instance.loaded_value(instance._meta.get_field(field).attname))
+            keys.update(self.cache_key(field, v) for v in values if v)
+        return keys
+
+    def invalidate(self, keys: set, using: str = None):
+        if not keys:
+            return
+
+        def _delete():
+            for key in keys:
+                self.local_cache.delete(key)
+            # generations outlive the entries cached under them, see get_cached
+            timeout = None if self._timeout is None else self._timeout * 2
+            try:
+                self.shared_cache.set_many({self.generation_key(key): uuid.uuid4().hex for key in keys}, timeout)
+                self.shared_cache.delete_many(list(keys))
+            except Exception as err:
+                logger.error(err)
+
+        # drop the local copies right away, and again on commit in case another
+        # thread of this process re-read the old row in between
+        for key in keys:
+            self.local_cache.delete(key)
+        transaction.on_commit(_delete, using=using)
+
+    @property
+    def _timeout(self):
+        return getattr(settings, 'KS_LOOKUP_CACHE_TIMEOUT', 300)
+
+    def _dump(self, instance) -> dict:
+        data = {}
+        for field in instance._meta.concrete_fields:
+            value = getattr(instance, field.attname)
+            if isinstance(value, FieldFile):
+                value = value.name
+            data[field.attname] = value
+        return data
+
+    def _load(self, data: dict):
+        data = copy.deepcopy(data)
+        return self.model.from_db(self.db, list(data), list(data.values()))
@@ -1,11 +1,141 @@
+import copy
+import secrets
+import threading
+import time
+from typing import List
+
 import shortuuid
 from model_utils.models import TimeStampedModel, SoftDeletableModel
 from django.db import models
+from django.db.models.fields.files import FieldFile
+
+_shortuuid = shortuuid.ShortUUID()
 
 
 def generate_uuid() -> str:
     """Generate a UUID."""
-    return shortuuid.ShortUUID().random(length=12)
+    return _shortuuid.random(length=12)
+
+
+class SortableIDGenerator:
+    """
+    Generate time ordered ids: a millisecond timestamp followed by random characters,
+    both encoded with the shortuuid alphabet, so ids sort by creation time.
+
+    Ids generated by one generator never decrease: within the same millisecond (or if
+    the clock goes backwards) the random part is incremented instead of redrawn.
+    Note the ordering only holds under a case sensitive collation.
+
+    Only the random part keeps ids of different processes apart: two ids made in the
+    same millisecond collide with a probability of about ``2 / 57 ** (length - time_length)``,
+    hence the 12 random characters by default.
+    """
+
+    def __init__(self, length: int = 20, time_length: int = 8, alphabet: str = None):
+        if length <= time_length:
+            raise ValueError('length must be greater than time_length')
+        self.alphabet = alphabet or _shortuuid.get_alphabet()
+        self.length = length
+        self.time_length = time_length
+        self.random_length = length - time_length
+        self._random_space = len(self.alphabet) ** self.random_length
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._last_random = 0
+
+    def _encode(self, number: int, length: int) -> str:
+        base = len(self.alphabet)
+        chars = []
+        for _ in range(length):
+            number, rem = divmod(number, base)
+            chars.append(self.alphabet[rem])
+        return ''.join(reversed(chars))
+
+    def _next(self) -> str:
+        ms = time.time_ns() // 1_000_000
+        if ms <= self._last_ms:
+            ms = self._last_ms
+            rnd = self._last_random + 1
+            if rnd >= self._random_space:
+                ms += 1
+                rnd = secrets.randbelow(self._random_space // 2)
+        else:
+            # leave headroom for increments within the same millisecond
+            rnd = secrets.randbelow(self._random_space // 2)
+        self._last_ms, self._last_random = ms, rnd
+        return self._encode(ms, self.time_length) + self._encode(rnd, self.random_length)
+
+    def generate(self) -> str:
+        with self._lock:
+            return self._next()
+
+    def generate_batch(self, count: int) -> List[str]:
+        with self._lock:
+            return [self._next() for _ in range(count)]
+
+
+_sortable_ids = SortableIDGenerator()
+
+
+def generate_sortable_uuid() -> str:
+    """Generate a time ordered UUID."""
+    return _sortable_ids.generate()
+
+
+def generate_sortable_uuids(count: int) -> List[str]:
+    """Generate ``count`` time ordered UUIDs at once, e.g. for ``bulk_create``."""
+    return _sortable_ids.generate_batch(count)
+
+
+class LoadedStateMixin:
+    """
+    Remember field values as loaded from, or last saved to, the database.
+
+    A ``FieldTracker`` declared on an abstract model never attaches to its concrete
+    subclasses, so abstract models use this to know what changed since load.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {}
+        instance._remember_loaded()
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields', args[3] if len(args) > 3 else None)
+        super().save(*args, **kwargs)
+        if not hasattr(self, '_loaded_values'):
+            self._loaded_values = {}
+        self._remember_loaded(update_fields)
+
+    def loaded_value(self, attname: str, default=None):
+        return getattr(self, '_loaded_values', {}).get(attname, default)
+
+    def changed_fields(self) -> list:
+        """Attnames of the fields changed since load, all of them if never loaded."""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return [f.attname for f in self._meta.concrete_fields]
+        return [
+            f.attname for f in self._meta.concrete_fields
+            if f.attname in self.__dict__
+            and (f.attname not in loaded or self._current_value(f.attname) != loaded[f.attname])
+        ]
+
+    def _current_value(self, attname: str):
+        value = self.__dict__.get(attname)
+        return value.name if isinstance(value, FieldFile) else value
+
+    def _remember_loaded(self, update_fields=None):
+        fields = self._meta.concrete_fields
+        if update_fields is not None:
+            fields = [self._meta.get_field(name) for name in update_fields]
+        for field in fields:
+            if field.attname in self.__dict__:
+                value = self._current_value(field.attname)
+                # dicts and lists (JSONField) may be mutated in place
+                self._loaded_values[field.attname] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
 
 
 class BaseModel(TimeStampedModel):
@@ -30,3 +160,27 @@ class BaseModelSoftDeletable(TimeStampedModel, SoftDeletableModel):
 
     class Meta:
         abstract = True
+
+
+class SortableBaseModel(BaseModel):
+    id = models.CharField(
+        max_length=30,
+        primary_key=True,
+        default=generate_sortable_uuid,
+        editable=False
+    )
+
+    class Meta:
+        abstract = True
+
+
+class SortableBaseModelSoftDeletable(BaseModelSoftDeletable):
+    id = models.CharField(
+        max_length=30,
+        primary_key=True,
+        default=generate_sortable_uuid,
+        editable=False
+    )
+
+    class Meta:
+        abstract = True
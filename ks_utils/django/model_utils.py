@@ -5,7 +5,6 @@ from urllib.request import urlopen
 from django.core.files.uploadedfile import InMemoryUploadedFile
 
 from django.utils.text import slugify
-from requests.models import Response
 
 
 def upload_to(instance, filename):
@@ -37,6 +36,8 @@ def upload_to_without_rename(instance, filename):
 
 
 def load_image_from_url(file, filename):
+    from requests.models import Response
+
     f = BytesIO()
     if isinstance(file, str):
         content = urlopen(file).read()
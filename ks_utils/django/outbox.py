@@ -0,0 +1,324 @@
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, router, transaction
+from django.db.models import Q
+from django.db.models.fields.files import FieldFile
+from django.utils.timezone import make_aware
+from django.utils.translation import gettext_lazy as _
+from model_utils import Choices
+from model_utils.fields import StatusField
+
+from .model import SortableBaseModel
+
+logger = logging.getLogger(__name__)
+
+MNS_BATCH_SIZE = 16
+# MNS caps a message and the bodies of a batch at 64KB, measured after base64 encoding
+MNS_BATCH_BYTES = 64 * 1024
+
+
+class AbstractOutboxEvent(SortableBaseModel):
+    """
+    A model change waiting to be published to MNS, see ``OutboxMixin`` and ``OutboxRelay``.
+    Events are relayed in ``created``, ``id`` order. Failed events are retried from
+    ``next_attempt_at`` on and end up ``failed`` once the relay gives up on them.
+    """
+    STATUS = Choices(
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+    KIND_CHOICES = Choices(
+        ('queue', 'Queue'),
+        ('topic', 'Topic'),
+    )
+    EVENT_CHOICES = Choices(
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    )
+
+    aggregate_type = models.CharField(max_length=100)
+    aggregate_id = models.CharField(max_length=30)
+    event = StatusField(choices_name='EVENT_CHOICES', default='updated')
+    fields = models.JSONField(blank=True, default=dict, encoder=DjangoJSONEncoder)
+    destination = models.CharField(max_length=255)
+    destination_kind = StatusField(choices_name='KIND_CHOICES', default='queue')
+    status = StatusField(choices_name='STATUS', default='pending', db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(blank=True, null=True, default=None)
+    last_error = models.TextField(blank=True, default='')
+    sent_at = models.DateTimeField(blank=True, null=True, default=None)
+
+    class Meta:
+        verbose_name = _('outbox event')
+        verbose_name_plural = _('outbox events')
+        abstract = True
+        # left unnamed so django derives a name within its 30 character limit
+        indexes = [
+            models.Index(fields=['status', 'created', 'id']),
+        ]
+
+    def to_message(self) -> str:
+        return json.dumps({
+            'id': self.id,
+            'aggregate': self.aggregate_type,
+            'aggregate_id': self.aggregate_id,
+            'event': self.event,
+            'fields': self.fields,
+            'created': self.created,
+        }, cls=DjangoJSONEncoder)
+
+    def __str__(self):
+        return '{} {} {}'.format(self.aggregate_type, self.aggregate_id, self.event)
+
+
+class OutboxMixin:
+    """
+    Record every write of the model as an outbox event in the same transaction.
+
+    Set ``outbox_model`` to a concrete ``AbstractOutboxEvent`` subclass and
+    ``outbox_destination`` to the MNS queue (or topic, see ``outbox_destination_kind``)
+    to enable it. Updates record the fields changed since load, taken from the model
+    ``tracker`` or ``LoadedStateMixin``, and saves without changes record nothing.
+    """
+    outbox_model = None
+    outbox_destination = ''
+    outbox_destination_kind = 'queue'
+
+    def save(self, *args, **kwargs):
+        if self.outbox_model is None:
+            return super().save(*args, **kwargs)
+
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields', args[3] if len(args) > 3 else None)
+        fields = self._outbox_changed_fields(update_fields)
+        using = kwargs.get('using', args[2] if len(args) > 2 else None)
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            result = super().save(*args, **kwargs)
+            if adding:
+                self.outbox_event('created', fields).save(using=using)
+            elif fields:
+                removed = 'is_removed' in fields and self.is_removed
+                self.outbox_event('deleted' if removed else 'updated', fields).save(using=using)
+        return result
+
+    def delete(self, using=None, *args, **kwargs):
+        if hasattr(self, 'is_removed'):
+            # SoftDeletableModel.delete(using, soft) also takes ``soft`` positionally
+            soft = args[0] if args else kwargs.pop('soft', True)
+            args, kwargs['soft'] = args[1:], soft
+            if self.outbox_model is None or soft:
+                # soft deletes go through save()
+                return super().delete(using, *args, **kwargs)
+        elif self.outbox_model is None:
+            return super().delete(using, *args, **kwargs)
+
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            self.outbox_event('deleted', []).save(using=using)
+            return super().delete(using, *args, **kwargs)
+
+    def _outbox_changed_fields(self, update_fields=None) -> list:
+        tracker = getattr(self, 'tracker', None)
+        if self._state.adding:
+            fields = {f.attname for f in self._meta.concrete_fields}
+        elif tracker is not None:
+            fields = set(tracker.changed())
+        elif hasattr(self, 'changed_fields'):
+            fields = set(self.changed_fields())
+        else:
+            fields = {f.attname for f in self._meta.concrete_fields}
+        if update_fields is not None:
+            fields &= {self._meta.get_field(name).attname for name in update_fields}
+        return sorted(fields)
+
+    def outbox_event(self, event: str, fields: list, **kwargs):
+        """Build, without saving, the outbox event for ``fields`` of this instance."""
+        values = {}
+        for name in fields:
+            value = getattr(self, name)
+            values[name] = value.name if isinstance(value, FieldFile) else value
+        return self.outbox_model(
+            aggregate_type=self._meta.label_lower,
+            aggregate_id=str(self.pk),
+            event=event,
+            fields=values,
+            destination=self.outbox_destination,
+            destination_kind=self.outbox_destination_kind,
+            **kwargs,
+        )
+
+
+class OutboxRelay:
+    """
+    Drain pending outbox events to MNS in batches, with at-least-once delivery.
+
+    Pending events are locked with ``select_for_update`` while they are published, so
+    concurrent relays on the same outbox run one after another. Events of an entity are
+    published in the order they were recorded: when one fails, it and the later events
+    of the entity are put back until its next attempt, with exponential backoff. After
+    ``max_attempts`` the event is marked ``failed`` and the entity moves on.
+    Consumers should dedupe on the event id.
+    """
+
+    def __init__(self, outbox_model, client=None, batch_size: int = 160, max_attempts: int = 10,
+                 retry_delay: float = 5, max_retry_delay: float = 600):
+        self.outbox_model = outbox_model
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from ks_utils.aliyun.mns.client import MNSClient
+            self._client = MNSClient()
+        return self._client
+
+    def drain(self) -> int:
+        """Publish one batch of due events, return the number of events sent."""
+        model = self.outbox_model
+        now = make_aware(datetime.now())
+        with transaction.atomic(using=router.db_for_write(model)):
+            events = list(
+                model.objects.select_for_update()
+                .filter(status=model.STATUS.pending)
+                .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+                .order_by('created', 'id')[:self.batch_size]
+            )
+            if not events:
+                return 0
+
+            # entity -> position and retry time of its earliest event waiting for a retry
+            waiting = {}
+            for event in (model.objects.filter(status=model.STATUS.pending, next_attempt_at__gt=now,
+                                               aggregate_id__in={e.aggregate_id for e in events})
+                          .order_by('created', 'id')):
+                waiting.setdefault(_entity(event), (_position(event), event.next_attempt_at))
+
+            def blocked(event):
+                entity = _entity(event)
+                return entity in waiting and _position(event) > waiting[entity][0]
+
+            sent = []
+            ready = sorted((e for e in events if not blocked(e)), key=_destination)
+            for (kind, destination), group in groupby(ready, key=_destination):
+                for chunk in self._chunks(kind, list(group)):
+                    # an earlier chunk of the entity may have failed meanwhile
+                    chunk = [e for e in chunk if not blocked(e)]
+                    if not chunk:
+                        continue
+                    if self._publish(kind, destination, chunk):
+                        sent.extend(chunk)
+                        continue
+                    for event in chunk:
+                        self._fail(event, now, f'failed to publish to {kind} {destination}')
+                        if event.status == model.STATUS.pending:
+                            waiting.setdefault(_entity(event), (_position(event), event.next_attempt_at))
+
+            # later events of an entity wait for its failed one, off the head of the outbox
+            deferred = {}
+            for event in events:
+                if event.status == model.STATUS.pending and event not in sent and blocked(event):
+                    deferred.setdefault(waiting[_entity(event)][1], []).append(event.id)
+            for next_attempt_at, ids in deferred.items():
+                model.objects.filter(id__in=ids).update(next_attempt_at=next_attempt_at)
+
+            if sent:
+                model.objects.filter(id__in=[e.id for e in sent]).update(
+                    status=model.STATUS.sent,
+                    sent_at=now,
+                    next_attempt_at=None,
+                )
+            return len(sent)
+
+    def run(self, interval: float = 1.0, stop=None):
+        """Drain until ``stop()`` returns true, sleeping ``interval`` seconds when idle."""
+        while not (stop and stop()):
+            try:
+                sent = self.drain()
+            except Exception as err:
+                logger.error(err)
+                sent = 0
+            if sent < self.batch_size:
+                time.sleep(interval)
+
+    def purge(self, before: datetime) -> int:
+        """Delete events sent before ``before``."""
+        model = self.outbox_model
+        deleted, _ = model.objects.filter(status=model.STATUS.sent, sent_at__lt=before).delete()
+        return deleted
+
+    def _chunks(self, kind: str, events: list):
+        """Split events into MNS requests within the message count and size limits."""
+        chunk, size = [], 0
+        for event in events:
+            event_size = _encoded_size(event.to_message())
+            if event_size > MNS_BATCH_BYTES:
+                # can never be sent, do not let it hold up the entity
+                self._fail(event, None, f'message of {event_size} bytes exceeds the MNS limit', final=True)
+                continue
+            limit = 1 if kind == self.outbox_model.KIND_CHOICES.topic else MNS_BATCH_SIZE
+            if chunk and (len(chunk) >= limit or size + event_size > MNS_BATCH_BYTES):
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(event)
+            size += event_size
+        if chunk:
+            yield chunk
+
+    def _fail(self, event, now, error: str, final: bool = False):
+        model = self.outbox_model
+        event.attempts += 1
+        event.last_error = error
+        if final or event.attempts >= self.max_attempts:
+            event.status = model.STATUS.failed
+            event.next_attempt_at = None
+            logger.error(f'outbox event {event.id} failed: {error}')
+        else:
+            delay = min(self.retry_delay * 2 ** (event.attempts - 1), self.max_retry_delay)
+            event.next_attempt_at = now + timedelta(seconds=delay)
+        model.objects.filter(id=event.id).update(
+            attempts=event.attempts,
+            last_error=event.last_error,
+            status=event.status,
+            next_attempt_at=event.next_attempt_at,
+        )
+
+    def _publish(self, kind: str, destination: str, events: list) -> bool:
+        if kind == self.outbox_model.KIND_CHOICES.topic:
+            event = events[0]
+            return self.client.send_topic_message(
+                topic_name=destination,
+                msg_body=event.to_message(),
+                msg_tag=event.aggregate_type,
+            ) is not None
+        return self.client.batch_send_message(
+            queue_name=destination,
+            msg_bodies=[event.to_message() for event in events],
+        ) is not None
+
+
+def _entity(event) -> tuple:
+    return event.aggregate_type, event.aggregate_id
+
+
+def _position(event) -> tuple:
+    return event.created, event.id
+
+
+def _destination(event) -> tuple:
+    return event.destination_kind, event.destination
+
+
+def _encoded_size(message: str) -> int:
+    return (len(message.encode('utf-8')) + 2) // 3 * 4
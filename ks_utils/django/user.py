@@ -1,20 +1,24 @@
 import logging
 from datetime import datetime
+from itertools import islice
+from typing import Iterable
 
-from django.db import models
+from django.db import models, router, transaction
 from django.utils.timezone import make_aware
 from django.utils.translation import gettext_lazy as _
 from model_utils import Choices, FieldTracker
 from model_utils.fields import StatusField
 from shortuuid.django_fields import ShortUUIDField
 
-from .model import BaseModelSoftDeletable
+from .manager import CachedSoftDeletableManager
+from .model import BaseModelSoftDeletable, LoadedStateMixin, generate_sortable_uuids
 from .model_utils import upload_to_without_rename, load_image_from_url
+from .outbox import OutboxMixin
 
 logger = logging.getLogger(__name__)
 
 
-class AbstractWXMPUser(BaseModelSoftDeletable):
+class AbstractWXMPUser(OutboxMixin, LoadedStateMixin, BaseModelSoftDeletable):
     GENDER_CHOICES = Choices(
         ('male', 'Male'),
         ('female', 'Female'),
@@ -54,6 +58,8 @@ class AbstractWXMPUser(BaseModelSoftDeletable):
     # the tracker
     tracker = FieldTracker()
 
+    objects = CachedSoftDeletableManager(cache_fields=('id', 'openid', 'unionid'))
+
     class Meta:
         verbose_name = _('user')
         verbose_name_plural = _('users')
@@ -156,5 +162,92 @@ class AbstractWXMPUser(BaseModelSoftDeletable):
         except Exception as err:
             logger.error(str(err))
 
+    @classmethod
+    def bulk_upsert(cls, records: Iterable[dict], batch_size: int = 1000, key: str = 'openid') -> dict:
+        """
+        Create or update users in batches, matched on ``key`` (``openid`` or ``unionid``).
+
+        Each record is a dict keyed by model field names. Existing users of a batch are
+        preloaded with a single ``in`` lookup, then written with ``bulk_create`` and
+        ``bulk_update``, so ``save()`` and signals are not triggered. Users whose fields
+        do not change are left untouched and not counted as updated. When ``outbox_model``
+        is set, each batch is written in a transaction together with its outbox events.
+
+        Records are validated a batch at a time: an invalid record raises ``ValueError``
+        before its batch is written, but earlier batches stay committed.
+        """
+        if key not in ('openid', 'unionid'):
+            raise ValueError('key must be openid or unionid')
+        if batch_size < 1:
+            raise ValueError('batch_size must be positive')
+
+        field_names = {f.name for f in cls._meta.concrete_fields} - {'id', 'created', 'modified', 'is_removed'}
+        result = {'created': 0, 'updated': 0}
+        records = iter(records)
+        while True:
+            batch = {}
+            for data in islice(records, batch_size):
+                if not data.get(key):
+                    raise ValueError(f'missing {key}')
+                unknown = set(data) - field_names
+                if unknown:
+                    raise ValueError(f'unknown fields: {sorted(unknown)}')
+                data = dict(data)
+                if 'gender' in data:
+                    data['gender'] = cls.gender_format(data['gender'])
+                # the later record wins when a key shows up twice in a batch
+                batch.setdefault(data[key], {}).update(data)
+            if not batch:
+                return result
+
+            existing = {getattr(user, key): user for user in cls.objects.filter(**{f'{key}__in': list(batch)})}
+            now = make_aware(datetime.now())
+            to_create, to_update, update_fields, changes = [], [], {'modified'}, []
+            for value, data in batch.items():
+                user = existing.get(value)
+                if user is None:
+                    user = cls(**data)
+                    to_create.append(user)
+                    changes.append((user, 'created', user._outbox_changed_fields()))
+                    continue
+                for k, v in data.items():
+                    setattr(user, k, v)
+                changed = user.changed_fields()
+                if not changed:
+                    continue
+                changes.append((user, 'updated', changed))
+                user.modified = now
+                update_fields.update(changed)
+                to_update.append(user)
+
+            events = []
+            if cls.outbox_model is not None and changes:
+                # draw the event ids at once instead of once per event through the field default
+                ids = generate_sortable_uuids(len(changes))
+                events = [user.outbox_event(event, fields, id=i) for i, (user, event, fields) in zip(ids, changes)]
+            keys = set().union(*(cls.objects.cache_keys(user) for user in to_update))
+            using = router.db_for_write(cls)
+            with transaction.atomic(using=using):
+                if to_create:
+                    cls.objects.bulk_create(to_create, batch_size=batch_size)
+                if to_update:
+                    cls.objects.bulk_update(to_update, fields=sorted(update_fields), batch_size=batch_size)
+                if events:
+                    cls.outbox_model.objects.bulk_create(events, batch_size=batch_size)
+                cls.objects.invalidate(keys, using=using)
+            result['created'] += len(to_create)
+            result['updated'] += len(to_update)
+
+    def save(self, *args, **kwargs):
+        keys = type(self).objects.cache_keys(self)
+        super().save(*args, **kwargs)
+        type(self).objects.invalidate(keys, using=self._state.db)
+
+    def delete(self, *args, **kwargs):
+        keys = type(self).objects.cache_keys(self)
+        result = super().delete(*args, **kwargs)
+        type(self).objects.invalidate(keys, using=self._state.db)
+        return result
+
     def __str__(self):
         return '{} - {}'.format(self.name, self.openid)
@@ -2,13 +2,14 @@ from datetime import datetime
 from io import BytesIO
 from typing import Any
 
-import pandas as pd
 from django.db.models import QuerySet
 from django.http import HttpResponse
 from django.utils import timezone
 
 
 def excel_download(qs: Any, fields: tuple, columns: list, sheet_name: str = 'exported', filename: str = 'exported.xlsx'):
+    import pandas as pd
+
     df = None
 
     if isinstance(qs, QuerySet):
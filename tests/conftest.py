@@ -0,0 +1,46 @@
+import pytest
+
+try:
+    import django
+    import model_utils  # noqa: F401
+    import shortuuid  # noqa: F401
+    from django.conf import settings
+except ImportError:
+    django = None
+
+
+def pytest_configure():
+    if django is None or settings.configured:
+        return
+    settings.configure(
+        SECRET_KEY='tests',
+        INSTALLED_APPS=['django.contrib.contenttypes', 'tests.testapp'],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        USE_TZ=True,
+        DEFAULT_AUTO_FIELD='django.db.models.AutoField',
+    )
+    django.setup()
+
+
+@pytest.fixture(scope='session')
+def django_tables():
+    if django is None:
+        pytest.skip('django is not installed')
+    from django.core.management import call_command
+
+    call_command('migrate', run_syncdb=True, verbosity=0)
+
+
+@pytest.fixture
+def db(django_tables):
+    from django.apps import apps
+    from django.core.cache import cache
+
+    yield
+    for model in apps.get_app_config('testapp').get_models():
+        model._base_manager.all().delete()
+        local = getattr(model.objects, '_local', None)
+        if local is not None:
+            local.clear()
+    cache.clear()
@@ -0,0 +1,383 @@
+import pytest
+
+pytest.importorskip('django')
+pytest.importorskip('model_utils')
+pytest.importorskip('shortuuid')
+
+from tests.testapp.models import OutboxEvent, OutboxUser, User  # noqa: E402
+
+pytestmark = pytest.mark.usefixtures('db')
+
+
+def test_sortable_ids_have_fixed_length_and_alphabet():
+    from ks_utils.django.model import SortableIDGenerator, generate_sortable_uuid
+
+    generator = SortableIDGenerator(length=14, time_length=6, alphabet='0123456789')
+    ids = [generator.generate() for _ in range(100)] + generator.generate_batch(100)
+    assert {len(i) for i in ids} == {14}
+    assert set(''.join(ids)) <= set('0123456789')
+
+    uuid = generate_sortable_uuid()
+    assert len(uuid) == 20
+    assert set(uuid) <= set(SortableIDGenerator().alphabet)
+
+
+def test_sortable_ids_increase_within_a_millisecond(monkeypatch):
+    from ks_utils.django import model
+
+    monkeypatch.setattr(model.time, 'time_ns', lambda: 1_700_000_000_000_000_000)
+    generator = model.SortableIDGenerator()
+    ids = [generator.generate() for _ in range(1000)]
+    assert ids == sorted(set(ids))
+    assert len({i[:8] for i in ids}) == 1
+
+
+def test_sortable_ids_overflow_into_next_millisecond(monkeypatch):
+    from ks_utils.django import model
+
+    monkeypatch.setattr(model.time, 'time_ns', lambda: 1_700_000_000_000_000_000)
+    generator = model.SortableIDGenerator(length=9, time_length=8)
+    ids = generator.generate_batch(200)
+    assert ids == sorted(set(ids))
+    assert len({i[:8] for i in ids}) > 1
+
+
+def test_sortable_id_batches_are_sorted_and_unique():
+    from ks_utils.django.model import generate_sortable_uuid, generate_sortable_uuids
+
+    ids = generate_sortable_uuids(10000) + generate_sortable_uuids(10000)
+    assert ids == sorted(set(ids))
+    assert generate_sortable_uuid() > ids[-1]
+
+
+def test_sortable_ids_need_random_part():
+    from ks_utils.django.model import SortableIDGenerator
+
+    with pytest.raises(ValueError):
+        SortableIDGenerator(length=8, time_length=8)
+
+
+def test_bulk_upsert_creates_and_updates():
+    User.objects.create(openid='o1', name='old')
+
+    result = User.bulk_upsert([
+        {'openid': 'o1', 'name': 'new', 'gender': '男'},
+        {'openid': 'o2', 'gender': 2},
+        {'openid': 'o3', 'gender': 'whatever'},
+    ], batch_size=2)
+
+    assert result == {'created': 2, 'updated': 1}
+    assert dict(User.objects.values_list('openid', 'gender')) == {'o1': 'male', 'o2': 'female', 'o3': 'unknown'}
+    assert User.objects.get(openid='o1').name == 'new'
+
+
+def test_bulk_upsert_duplicate_keys_last_wins():
+    result = User.bulk_upsert([
+        {'openid': 'o1', 'name': 'first', 'city': 'shanghai'},
+        {'openid': 'o1', 'name': 'second'},
+    ])
+
+    assert result == {'created': 1, 'updated': 0}
+    user = User.objects.get(openid='o1')
+    assert (user.name, user.city) == ('second', 'shanghai')
+
+
+def test_bulk_upsert_skips_unchanged_users():
+    user = User.objects.create(openid='o1', name='a', gender='male')
+    modified = User.objects.get(id=user.id).modified
+
+    result = User.bulk_upsert([{'openid': 'o1', 'name': 'a', 'gender': '男'}])
+
+    assert result == {'created': 0, 'updated': 0}
+    assert User.objects.get(id=user.id).modified == modified
+
+
+def test_bulk_upsert_keeps_earlier_batches_on_invalid_record():
+    with pytest.raises(ValueError):
+        User.bulk_upsert([{'openid': 'o1'}, {'openid': 'o2'}, {'name': 'no openid'}], batch_size=2)
+
+    assert sorted(User.objects.values_list('openid', flat=True)) == ['o1', 'o2']
+
+
+def test_bulk_upsert_by_unionid():
+    User.objects.create(openid='o1', unionid='u1')
+
+    result = User.bulk_upsert([{'unionid': 'u1', 'name': 'a'}, {'unionid': 'u2', 'name': 'b'}], key='unionid')
+
+    assert result == {'created': 1, 'updated': 1}
+    assert User.objects.get(unionid='u1').openid == 'o1'
+    assert User.objects.get(unionid='u2').name == 'b'
+
+
+@pytest.mark.parametrize('records, kwargs', [
+    ([{'openid': 'o1', 'nickname': 'x'}], {}),
+    ([{'name': 'x'}], {}),
+    ([{'openid': 'o1'}], {'key': 'name'}),
+    ([{'openid': 'o1'}], {'batch_size': 0}),
+])
+def test_bulk_upsert_rejects_invalid_input(records, kwargs):
+    with pytest.raises(ValueError):
+        User.bulk_upsert(records, **kwargs)
+    assert not User.objects.exists()
+
+
+def _cache_queries(func):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as ctx:
+        result = func()
+    return result, len(ctx.captured_queries)
+
+
+def test_get_cached_hits_cache():
+    user = User.objects.create(openid='o1', unionid='u1', name='a')
+
+    cached, queries = _cache_queries(lambda: User.objects.get_cached(id=user.id))
+    assert (cached.pk, queries) == (user.pk, 1)
+    cached, queries = _cache_queries(lambda: User.objects.get_cached(id=user.id))
+    assert (cached.name, queries) == ('a', 0)
+
+    User.objects.local_cache.clear()
+    cached, queries = _cache_queries(lambda: User.objects.get_cached(openid='o1'))
+    assert (cached.pk, queries) == (user.pk, 1)
+    cached, queries = _cache_queries(lambda: User.objects.get_cached(openid='o1'))
+    assert queries == 0
+
+    with pytest.raises(ValueError):
+        User.objects.get_cached(name='a')
+    with pytest.raises(User.DoesNotExist):
+        User.objects.get_cached(openid='missing')
+
+
+def test_get_cached_returns_independent_instances():
+    user = User.objects.create(openid='o1', raw_data={'a': 1})
+
+    User.objects.get_cached(id=user.id).raw_data['a'] = 2
+    assert User.objects.get_cached(id=user.id).raw_data == {'a': 1}
+
+
+def test_save_invalidates_cache():
+    user = User.objects.create(openid='o1', name='a')
+    User.objects.get_cached(id=user.id)
+
+    user.name = 'b'
+    user.save()
+
+    assert User.objects.get_cached(id=user.id).name == 'b'
+
+
+def test_write_during_refill_is_not_cached(monkeypatch):
+    user = User.objects.create(openid='o1', name='a')
+    get = User.objects.get
+
+    def get_then_write(**kwargs):
+        # another request updates the row after this one read it, before it is cached
+        stale = get(**kwargs)
+        keys = User.objects.cache_keys(stale)
+        User.objects.filter(id=user.id).update(name='b')
+        User.objects.invalidate(keys)
+        return stale
+
+    monkeypatch.setattr(User.objects, 'get', get_then_write)
+    assert User.objects.get_cached(id=user.id).name == 'a'
+    monkeypatch.setattr(User.objects, 'get', get)
+
+    User.objects.local_cache.clear()
+    assert User.objects.get_cached(id=user.id).name == 'b'
+
+
+def test_bulk_upsert_invalidates_on_write_database(monkeypatch):
+    from django.db import router
+
+    User.objects.create(openid='o1', name='a')
+    usings = []
+    invalidate = User.objects.invalidate
+    monkeypatch.setattr(User.objects, 'invalidate',
+                        lambda keys, using=None: usings.append(using) or invalidate(keys, using))
+
+    User.bulk_upsert([{'openid': 'o1', 'name': 'b'}])
+
+    assert usings == [router.db_for_write(User)]
+
+
+@pytest.mark.parametrize('field', ['openid', 'unionid'])
+def test_key_change_invalidates_old_key(field):
+    User.objects.create(openid='o1', unionid='u1')
+    old = {'openid': 'o1', 'unionid': 'u1'}[field]
+    cached = User.objects.get_cached(**{field: old})
+
+    setattr(cached, field, 'changed')
+    cached.save()
+
+    with pytest.raises(User.DoesNotExist):
+        User.objects.get_cached(**{field: old})
+    assert User.objects.get_cached(**{field: 'changed'}).pk == cached.pk
+
+
+def test_soft_delete_invalidates_cache():
+    user = User.objects.create(openid='o1')
+    User.objects.get_cached(id=user.id)
+    User.objects.get_cached(openid='o1')
+
+    User.objects.get(id=user.id).delete()
+
+    with pytest.raises(User.DoesNotExist):
+        User.objects.get_cached(id=user.id)
+    with pytest.raises(User.DoesNotExist):
+        User.objects.get_cached(openid='o1')
+
+
+def test_bulk_upsert_invalidates_cache():
+    user = User.objects.create(openid='o1', unionid='u1', name='a')
+    User.objects.get_cached(unionid='u1')
+
+    User.bulk_upsert([{'openid': 'o1', 'name': 'b', 'unionid': 'u2'}])
+
+    with pytest.raises(User.DoesNotExist):
+        User.objects.get_cached(unionid='u1')
+    assert User.objects.get_cached(unionid='u2').name == 'b'
+    assert User.objects.get_cached(id=user.id).name == 'b'
+
+
+def _events(**kwargs):
+    return list(OutboxEvent.objects.filter(**kwargs).order_by('created', 'id'))
+
+
+def test_outbox_records_changed_fields_only():
+    user = OutboxUser.objects.create(openid='o1', name='a')
+    created, = _events(event='created')
+    assert created.aggregate_id == user.id and created.fields['openid'] == 'o1'
+
+    user = OutboxUser.objects.get(id=user.id)
+    user.save()
+    user.name = 'a'
+    user.save()
+    assert len(_events()) == 1
+
+    user.name = 'b'
+    user.save()
+    user.city = 'shanghai'
+    user.save()
+    assert [e.fields for e in _events(event='updated')] == [{'name': 'b'}, {'city': 'shanghai'}]
+
+
+def test_outbox_uses_positional_database(monkeypatch):
+    from django.db import transaction
+
+    usings = []
+    atomic = transaction.atomic
+    monkeypatch.setattr(transaction, 'atomic', lambda using=None, **kw: usings.append(using) or atomic(using, **kw))
+    monkeypatch.setattr('django.db.router.db_for_write', lambda model, **hints: 'router')
+
+    OutboxUser(openid='o1').save(False, False, 'default')
+
+    assert usings[0] == 'default'
+    assert len(_events(event='created')) == 1
+
+
+@pytest.mark.parametrize('args, kwargs, removed', [
+    ((), {}, True),
+    ((None, True), {}, True),
+    ((None, False), {}, False),
+    ((), {'soft': False}, False),
+])
+def test_outbox_delete(args, kwargs, removed):
+    user = OutboxUser.objects.create(openid='o1')
+
+    OutboxUser.objects.get(id=user.id).delete(*args, **kwargs)
+
+    assert OutboxUser.all_objects.filter(id=user.id).exists() is removed
+    deleted, = _events(event='deleted')
+    assert deleted.fields == ({'is_removed': True} if removed else {})
+
+
+def test_bulk_upsert_records_outbox_events():
+    OutboxUser.objects.create(openid='o1', name='a')
+    OutboxUser.objects.create(openid='o2', name='b')
+    OutboxEvent.objects.all().delete()
+
+    OutboxUser.bulk_upsert([
+        {'openid': 'o1', 'name': 'changed'},
+        {'openid': 'o2', 'name': 'b'},
+        {'openid': 'o3', 'name': 'c'},
+    ])
+
+    assert [(e.event, e.fields.get('name')) for e in _events()] == [('updated', 'changed'), ('created', 'c')]
+    assert _events(event='updated')[0].fields == {'name': 'changed'}
+
+
+class FakeMNSClient:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.batches = []
+
+    def batch_send_message(self, queue_name, msg_bodies, delay_seconds=-1):
+        if queue_name in self.failing:
+            return None
+        self.batches.append((queue_name, msg_bodies))
+        return [{}] * len(msg_bodies)
+
+    def send_topic_message(self, topic_name, msg_body, msg_tag=''):
+        return self.batch_send_message(topic_name, [msg_body])
+
+
+def _event(destination, aggregate_id='a1', **kwargs):
+    return OutboxEvent.objects.create(aggregate_type='testapp.outboxuser', aggregate_id=aggregate_id,
+                                      destination=destination, **kwargs)
+
+
+def test_relay_failing_events_do_not_block_others():
+    from ks_utils.django.outbox import OutboxRelay
+
+    for i in range(160):
+        _event('bad', aggregate_id=f'bad{i}')
+    for i in range(40):
+        _event('good', aggregate_id=f'good{i}')
+    relay = OutboxRelay(OutboxEvent, client=FakeMNSClient(failing=['bad']), batch_size=160, max_attempts=2)
+
+    assert relay.drain() == 0
+    assert relay.drain() == 40
+    assert relay.drain() == 0
+    assert all(e.attempts == 1 and e.next_attempt_at for e in _events(destination='bad'))
+
+    OutboxEvent.objects.filter(destination='bad').update(next_attempt_at=None)
+    assert relay.drain() == 0
+    assert OutboxEvent.objects.filter(status=OutboxEvent.STATUS.failed).count() == 160
+
+
+def test_relay_keeps_entity_order_on_failure():
+    from ks_utils.django.outbox import OutboxRelay
+
+    first = _event('bad')
+    second = _event('good')
+    other = _event('good', aggregate_id='a2')
+    client = FakeMNSClient(failing=['bad'])
+
+    assert OutboxRelay(OutboxEvent, client=client).drain() == 1
+
+    assert client.batches == [('good', [OutboxEvent.objects.get(id=other.id).to_message()])]
+    first, second = OutboxEvent.objects.get(id=first.id), OutboxEvent.objects.get(id=second.id)
+    assert second.status == OutboxEvent.STATUS.pending
+    assert second.next_attempt_at == first.next_attempt_at is not None
+
+
+def test_relay_chunks_batches_by_size():
+    from ks_utils.django.outbox import MNS_BATCH_BYTES, OutboxRelay
+
+    for i in range(5):
+        _event('users', aggregate_id=f'a{i}', fields={'data': 'x' * 20000})
+    too_big = _event('users', fields={'data': 'x' * MNS_BATCH_BYTES})
+    client = FakeMNSClient()
+
+    assert OutboxRelay(OutboxEvent, client=client).drain() == 5
+
+    assert [len(bodies) for _, bodies in client.batches] == [2, 2, 1]
+    assert OutboxEvent.objects.get(id=too_big.id).status == OutboxEvent.STATUS.failed
+
+
+def test_outbox_index_name_fits():
+    from django.core import checks
+
+    assert not [e for e in checks.run_checks() if e.id == 'models.E034']
+    assert all(len(index.name) <= 30 for index in OutboxEvent._meta.indexes)
@@ -1,7 +1,16 @@
 import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
 
 from ks_utils import __version__
 
+IMPORT_BUDGET_SECONDS = float(os.environ.get('KS_IMPORT_BUDGET', '0.5'))
+HEAVY_MODULES = ('pandas', 'xlsxwriter', 'tablestore', 'mns')
+
 
 def test_version():
     assert __version__ == '0.1.0'
@@ -49,3 +58,70 @@ def test_msn_receive():
 
     assert resp.message_id is not None
     assert resp.message_body_md5 is not None
+
+
+@pytest.mark.parametrize('module', [
+    'ks_utils.aliyun.mns.client',
+    'ks_utils.aliyun.ots.client',
+    'ks_utils.ninja.response',
+    'ks_utils.django.model_utils',
+    'ks_utils.django.model',
+    'ks_utils.django.manager',
+    'ks_utils.django.outbox',
+    'ks_utils.django.user',
+])
+def test_import_time(module):
+    setup = ''
+    if module.startswith('ks_utils.django.'):
+        # models can only be declared once django is set up, keep that out of the timing
+        setup = 'import django\nfrom django.conf import settings\nsettings.configure()\ndjango.setup()\n'
+    code = (
+        'import json, sys, time\n'
+        f'{setup}'
+        't = time.perf_counter()\n'
+        f'import {module}\n'
+        'elapsed = time.perf_counter() - t\n'
+        f'print(json.dumps([elapsed, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))\n'
+    )
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    missing = re.search(r"ModuleNotFoundError: No module named '([\w.]+)'", proc.stderr)
+    # a heavy module missing here means it is imported eagerly, which is what this test catches
+    if missing and missing.group(1).split('.')[0] not in HEAVY_MODULES:
+        pytest.skip(missing.group(0))
+    assert proc.returncode == 0, proc.stderr
+
+    elapsed, loaded = json.loads(proc.stdout)
+    assert loaded == []
+    assert elapsed < IMPORT_BUDGET_SECONDS
+
+
+def test_mns_fake_roundtrip(monkeypatch):
+    pytest.importorskip('mns')
+    from benchmarks.fakes import FakeMNSServer
+    from ks_utils.aliyun.mns.client import MNSClient
+
+    with FakeMNSServer() as server:
+        monkeypatch.setenv('MNS_ENDPOINT', server.endpoint)
+        monkeypatch.setenv('MNS_ACCESS_ID', 'id')
+        monkeypatch.setenv('MNS_ACCESS_KEY', 'key')
+        c = MNSClient()
+        assert c.send_message(queue_name='test', msg_body=json.dumps({'test': '0002'})).message_id
+        assert len(c.batch_send_message(queue_name='test', msg_bodies=['a', 'b'])) == 2
+
+        resp = c.receive_message(queue_name='test')
+        assert json.loads(resp.message_body) == {'test': '0002'}
+        c.delete_message(queue_name='test', receipt_handle=resp.receipt_handle)
+        assert server.inflight == {}
+
+
+def test_benchmark_counts_failed_calls():
+    from itertools import cycle
+
+    from benchmarks.harness import compare, measure
+
+    results = cycle([None, 'ok'])
+    result = measure('flaky', lambda: next(results), iterations=4, ok=bool)
+    assert result.failures == 2
+    assert compare([result], {'flaky': {'ops_per_second': 0, 'p95_ms': 1e9, 'peak_kib': 1e9}}, 0.25) == [
+        'flaky: 2 failed calls, baseline 0',
+    ]
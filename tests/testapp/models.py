@@ -0,0 +1,15 @@
+from ks_utils.django.outbox import AbstractOutboxEvent
+from ks_utils.django.user import AbstractWXMPUser
+
+
+class User(AbstractWXMPUser):
+    pass
+
+
+class OutboxEvent(AbstractOutboxEvent):
+    pass
+
+
+class OutboxUser(AbstractWXMPUser):
+    outbox_model = OutboxEvent
+    outbox_destination = 'users'